@@ -1,65 +1,257 @@
+import gzip
+import hashlib
+import importlib
+import json
 import os
-import psycopg2
-from flask import Flask, render_template, request, redirect, session
-from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
-from datetime import datetime
-
-import psycopg2
-from flask import Flask, redirect, render_template, request, send_from_directory, session
+import threading
+import time
+from datetime import date, datetime
+
+from flask import (
+    Blueprint,
+    Flask,
+    current_app,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    session,
+    url_for,
+)
+from itsdangerous import BadSignature, Signer
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 
-app = Flask(__name__)
-app.secret_key = "chave_super_secreta_123"
-app.secret_key = os.getenv("SECRET_KEY", "chave_super_secreta_123")
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-USE_SQLITE = not DATABASE_URL or DATABASE_URL.startswith("sqlite:///")
-SQLITE_PATH = DATABASE_URL.replace("sqlite:///", "") if DATABASE_URL and DATABASE_URL.startswith("sqlite:///") else os.path.join(os.path.dirname(__file__), "app.db")
+bp = Blueprint("principal", __name__)
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
 ALLOWED_EXTENSIONS = {
     "pdf", "doc", "docx", "ppt", "pptx", "xls", "xlsx", "txt", "zip", "rar", "jpg", "jpeg", "png"
 }
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+COMPRESS_MIMETYPES = {"text/html", "text/css", "text/plain", "application/json", "application/javascript"}
+# Só estáticos e pacotes de simulado são pré-comprimidos e guardados em memória.
+PRECOMPRESS_ENDPOINTS = {"static", "principal.pacote_simulado"}
+PRECOMPRESS_MAX_SIZE = 512 * 1024
 
 
 # =========================
-# CONEXÃO
 # UTILITÁRIOS
 # =========================
+class Banco:
+    """Backend de uma aplicação criada por create_app(): driver, destino e pool."""
+
+    def __init__(self, database_url, pool_min=1, pool_max=10, pool_timeout=30):
+        self.database_url = database_url
+        self.usa_sqlite = not database_url or database_url.startswith("sqlite:///")
+        self.sqlite_path = database_url.replace("sqlite:///", "") if database_url and self.usa_sqlite else os.path.join(os.path.dirname(__file__), "app.db")
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_timeout = pool_timeout
+        # Só o driver escolhido pela DATABASE_URL é importado.
+        self.driver = importlib.import_module("sqlite3" if self.usa_sqlite else "psycopg2.pool")
+        self._pool = None
+        self._pool_pid = None
+        self._vagas = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        # Conexões não sobrevivem a um fork: cada processo abre o seu próprio pool.
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = self.driver.ThreadedConnectionPool(self.pool_min, self.pool_max, self.database_url)
+                self._pool_pid = os.getpid()
+                self._vagas = threading.BoundedSemaphore(self.pool_max)
+            return self._pool, self._vagas
+
+    def conectar(self):
+        if self.usa_sqlite:
+            conn = self.driver.connect(self.sqlite_path)
+            conn.execute("PRAGMA foreign_keys = ON")
+            return conn
+
+        pool, vagas = self.pool()
+        # ThreadedConnectionPool falha na hora quando está cheio (ex.: gthread
+        # com mais threads que DB_POOL_MAX); aqui a requisição espera por uma
+        # conexão livre até DB_POOL_TIMEOUT segundos.
+        if not vagas.acquire(timeout=self.pool_timeout):
+            raise Exception("Nenhuma conexão livre no pool do banco.")
+        try:
+            return ConexaoPool(pool, vagas)
+        except Exception:
+            vagas.release()
+            raise
+
+    def fechar(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+            self._pool_pid = None
+
+
+class ConexaoPool:
+    """Conexão emprestada do pool; close() a devolve em vez de fechá-la."""
+
+    def __init__(self, pool, vagas):
+        self._pool = pool
+        self._vagas = vagas
+        self._conn = pool.getconn()
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            conn.rollback()
+        except Exception:
+            self._pool.putconn(conn, close=True)
+        else:
+            self._pool.putconn(conn)
+        finally:
+            self._vagas.release()
+
+
+def banco():
+    return current_app.extensions["banco"]
+
+
 def get_db():
-    if USE_SQLITE:
-        conn = sqlite3.connect(SQLITE_PATH)
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+    conn = banco().conectar()
+    # Devolvida em liberar_conexoes() mesmo se a view falhar antes do close().
+    g.setdefault("conexoes", []).append(conn)
+    return conn
 
-    if not DATABASE_URL:
-        raise Exception("DATABASE_URL não configurada.")
-    return psycopg2.connect(DATABASE_URL)
+
+def liberar_conexoes(_erro=None):
+    for conn in g.pop("conexoes", []):
+        try:
+            conn.close()
+        except Exception:
+            current_app.logger.exception("Falha ao liberar conexão do banco.")
 
 
 def run_query(cur, query, params=()):
-    if USE_SQLITE:
+    if banco().usa_sqlite:
         query = query.replace("%s", "?")
     cur.execute(query, params)
 
 
+def run_many(cur, query, seq_params):
+    if banco().usa_sqlite:
+        query = query.replace("%s", "?")
+    cur.executemany(query, seq_params)
+
+
 def fetch_all(cur):
     rows = cur.fetchall()
-    return [tuple(r) for r in rows] if USE_SQLITE else rows
+    return [tuple(r) for r in rows] if banco().usa_sqlite else rows
 
 
 def fetch_one(cur):
     row = cur.fetchone()
-    return tuple(row) if (row and USE_SQLITE) else row
+    return tuple(row) if (row and banco().usa_sqlite) else row
 
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# =========================
+# COMPRESSÃO E ARQUIVOS ESTÁTICOS
+# =========================
+def versao_asset(filename):
+    versoes = current_app.extensions["assets"]
+    versao = versoes.get(filename)
+    if versao is None:
+        with open(os.path.join(current_app.static_folder, filename), "rb") as f:
+            versao = hashlib.sha256(f.read()).hexdigest()[:12]
+        versoes[filename] = versao
+    return versao
+
+
+@bp.app_template_global()
+def asset_url(filename):
+    return url_for("static", filename=filename, v=versao_asset(filename))
+
+
+def escolher_codificacao():
+    aceitas = request.accept_encodings
+    if current_app.extensions["brotli"] and aceitas["br"]:
+        return "br"
+    if aceitas["gzip"]:
+        return "gzip"
+    return None
+
+
+def comprimir(dados, codificacao, nivel_maximo=False):
+    if codificacao == "br":
+        return current_app.extensions["brotli"].compress(dados, quality=11 if nivel_maximo else 4)
+    return gzip.compress(dados, compresslevel=9 if nivel_maximo else 6, mtime=0)
+
+
+@bp.after_app_request
+def otimizar_resposta(resposta):
+    if request.endpoint == "static":
+        versoes = current_app.extensions["assets"]
+        filename = request.view_args.get("filename")
+        if filename in versoes and request.args.get("v") == versoes[filename]:
+            resposta.cache_control.no_cache = None
+            resposta.cache_control.public = True
+            resposta.cache_control.max_age = 31536000
+            resposta.cache_control.immutable = True
+
+    if resposta.mimetype not in COMPRESS_MIMETYPES:
+        return resposta
+
+    resposta.vary.add("Accept-Encoding")
+    if resposta.status_code != 200 or "Content-Encoding" in resposta.headers:
+        return resposta
+
+    # Downloads (/uploads) e corpos grandes vão sem compressão, sem carregar o
+    # arquivo inteiro na memória.
+    if resposta.headers.get("Content-Disposition", "").startswith("attachment"):
+        return resposta
+    if (resposta.content_length or 0) > current_app.config["COMPRESS_MAX_SIZE"]:
+        return resposta
+
+    codificacao = escolher_codificacao()
+    if not codificacao:
+        return resposta
+
+    resposta.direct_passthrough = False
+    dados = resposta.get_data()
+    if not current_app.config["COMPRESS_MIN_SIZE"] <= len(dados) <= current_app.config["COMPRESS_MAX_SIZE"]:
+        return resposta
+
+    # Estáticos e pacotes têm conteúdo estável identificado pelo ETag: comprime
+    # uma vez no nível máximo e reaproveita nas próximas requisições.
+    etag, _ = resposta.get_etag()
+    if etag and request.endpoint in PRECOMPRESS_ENDPOINTS and len(dados) <= PRECOMPRESS_MAX_SIZE:
+        comprimidos = current_app.extensions["comprimidos"]
+        chave = (etag, codificacao)
+        comprimido = comprimidos.get(chave)
+        if comprimido is None:
+            if len(comprimidos) >= 256:
+                comprimidos.clear()
+            comprimido = comprimir(dados, codificacao, nivel_maximo=True)
+            comprimidos[chave] = comprimido
+    else:
+        comprimido = comprimir(dados, codificacao)
+
+    if etag:
+        resposta.set_etag(etag, weak=True)
+
+    resposta.set_data(comprimido)
+    resposta.headers["Content-Encoding"] = codificacao
+    return resposta
+
+
 # =========================
 # CRIAÇÃO DE TABELAS
 # =========================
@@ -67,59 +259,7 @@ def criar_tabelas():
     conn = get_db()
     cur = conn.cursor()
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS turmas (
-        id SERIAL PRIMARY KEY,
-        nome TEXT NOT NULL
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS usuarios (
-        id SERIAL PRIMARY KEY,
-        nome TEXT,
-        login TEXT UNIQUE,
-        senha TEXT,
-        tipo TEXT,
-        turma_id INTEGER REFERENCES turmas(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS simulados (
-        id SERIAL PRIMARY KEY,
-        titulo TEXT,
-        turma_id INTEGER REFERENCES turmas(id),
-        ativo BOOLEAN DEFAULT TRUE
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS questoes (
-        id SERIAL PRIMARY KEY,
-        simulado_id INTEGER REFERENCES simulados(id) ON DELETE CASCADE,
-        enunciado TEXT,
-        alt_a TEXT,
-        alt_b TEXT,
-        alt_c TEXT,
-        alt_d TEXT,
-        alt_e TEXT,
-        correta TEXT
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS resultados (
-        id SERIAL PRIMARY KEY,
-        aluno_id INTEGER REFERENCES usuarios(id),
-        simulado_id INTEGER REFERENCES simulados(id),
-        acertos INTEGER,
-        total INTEGER,
-        percentual FLOAT,
-        data_realizacao DATE
-    );
-    """)
-    if USE_SQLITE:
+    if banco().usa_sqlite:
         cur.executescript(
             """
             CREATE TABLE IF NOT EXISTS turmas (
@@ -265,9 +405,6 @@ def criar_tabelas():
 def criar_admin():
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("SELECT id FROM usuarios WHERE login='admin'")
-    if not cur.fetchone():
-        cur.execute("""
     run_query(cur, "SELECT id FROM usuarios WHERE login='admin'")
     if not fetch_one(cur):
         run_query(
@@ -275,8 +412,6 @@ def criar_admin():
             """
             INSERT INTO usuarios (nome, login, senha, tipo)
             VALUES (%s,%s,%s,%s)
-        """, ("Administrador", "admin",
-              generate_password_hash("123456"), "admin"))
             """,
             ("Administrador", "admin", generate_password_hash("123456"), "admin"),
         )
@@ -285,7 +420,7 @@ def criar_admin():
     conn.close()
 
 
-@app.route("/init")
+@bp.route("/init")
 def init():
     criar_tabelas()
     criar_admin()
@@ -295,23 +430,19 @@ def init():
 # =========================
 # LOGIN
 # =========================
-@app.route("/")
+@bp.route("/")
 def home():
     return redirect("/login")
 
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
-        login = request.form.get("login")
-        senha = request.form.get("senha")
         login_value = request.form.get("login", "").strip()
         senha = request.form.get("senha", "")
 
         conn = get_db()
         cur = conn.cursor()
-        cur.execute("SELECT id, senha, tipo FROM usuarios WHERE login=%s", (login,))
-        user = cur.fetchone()
         run_query(cur, "SELECT id, senha, tipo FROM usuarios WHERE login=%s", (login_value,))
         user = fetch_one(cur)
         cur.close()
@@ -327,7 +458,7 @@ def login():
     return render_template("login.html")
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     session.clear()
     return redirect("/login")
@@ -336,7 +467,7 @@ def logout():
 # =========================
 # ADMIN DASHBOARD
 # =========================
-@app.route("/admin")
+@bp.route("/admin")
 def admin():
     if session.get("tipo") != "admin":
         return redirect("/login")
@@ -346,7 +477,7 @@ def admin():
 # =========================
 # TURMAS
 # =========================
-@app.route("/turmas", methods=["GET", "POST"])
+@bp.route("/turmas", methods=["GET", "POST"])
 def turmas():
     if session.get("tipo") != "admin":
         return redirect("/login")
@@ -355,15 +486,11 @@ def turmas():
     cur = conn.cursor()
 
     if request.method == "POST":
-        nome = request.form.get("nome")
         nome = request.form.get("nome", "").strip()
         if nome:
-            cur.execute("INSERT INTO turmas (nome) VALUES (%s)", (nome,))
-            run_query(cur, "INSERT OR IGNORE INTO turmas (nome) VALUES (%s)" if USE_SQLITE else "INSERT INTO turmas (nome) VALUES (%s) ON CONFLICT (nome) DO NOTHING", (nome,))
+            run_query(cur, "INSERT OR IGNORE INTO turmas (nome) VALUES (%s)" if banco().usa_sqlite else "INSERT INTO turmas (nome) VALUES (%s) ON CONFLICT (nome) DO NOTHING", (nome,))
             conn.commit()
 
-    cur.execute("SELECT id, nome FROM turmas ORDER BY id DESC")
-    lista = cur.fetchall()
     run_query(cur, "SELECT id, nome FROM turmas ORDER BY id DESC")
     lista = fetch_all(cur)
 
@@ -376,7 +503,7 @@ def turmas():
 # =========================
 # SIMULADOS ADMIN
 # =========================
-@app.route("/matricular", methods=["GET", "POST"])
+@bp.route("/matricular", methods=["GET", "POST"])
 def matricular():
     if session.get("tipo") != "admin":
         return redirect("/login")
@@ -395,7 +522,7 @@ def matricular():
                 cur,
                 (
                     "INSERT OR IGNORE INTO usuarios (nome, login, senha, tipo, turma_id) VALUES (%s,%s,%s,'aluno',%s)"
-                    if USE_SQLITE
+                    if banco().usa_sqlite
                     else "INSERT INTO usuarios (nome, login, senha, tipo, turma_id) VALUES (%s,%s,%s,'aluno',%s) ON CONFLICT (login) DO NOTHING"
                 ),
                 (nome, login_value, generate_password_hash(senha), turma_id),
@@ -423,7 +550,7 @@ def matricular():
     return render_template("matricular.html", turmas=turmas, alunos=alunos)
 
 
-@app.route("/materiais-admin", methods=["GET", "POST"])
+@bp.route("/materiais-admin", methods=["GET", "POST"])
 def materiais_admin():
     if session.get("tipo") != "admin":
         return redirect("/login")
@@ -464,14 +591,14 @@ def materiais_admin():
     return render_template("materiais_admin.html", turmas=turmas, lista=lista)
 
 
-@app.route("/uploads/<path:filename>")
+@bp.route("/uploads/<path:filename>")
 def download_upload(filename):
     if session.get("tipo") not in {"admin", "aluno"}:
         return redirect("/login")
     return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=True)
 
 
-@app.route("/simulados-admin", methods=["GET", "POST"])
+@bp.route("/simulados-admin", methods=["GET", "POST"])
 def simulados_admin():
     if session.get("tipo") != "admin":
         return redirect("/login")
@@ -480,38 +607,28 @@ def simulados_admin():
     cur = conn.cursor()
 
     if request.method == "POST":
-        titulo = request.form.get("titulo")
         titulo = request.form.get("titulo", "").strip()
         turma = request.form.get("turma")
         if titulo and turma:
-            cur.execute("INSERT INTO simulados (titulo, turma_id) VALUES (%s,%s)",
-                        (titulo, turma))
             run_query(cur, "INSERT INTO simulados (titulo, turma_id) VALUES (%s,%s)", (titulo, turma))
             conn.commit()
 
-    cur.execute("SELECT id, nome FROM turmas")
-    turmas = cur.fetchall()
     run_query(cur, "SELECT id, nome FROM turmas ORDER BY nome")
     turmas = fetch_all(cur)
 
-    cur.execute("SELECT id, titulo FROM simulados")
-    lista = cur.fetchall()
     run_query(cur, "SELECT id, titulo FROM simulados ORDER BY id DESC")
     lista = fetch_all(cur)
 
     cur.close()
     conn.close()
 
-    return render_template("simulados_admin.html",
-                           turmas=turmas,
-                           lista=lista)
     return render_template("simulados_admin.html", turmas=turmas, lista=lista)
 
 
 # =========================
 # ADICIONAR QUESTÃO
 # =========================
-@app.route("/adicionar-questao/<int:simulado_id>", methods=["GET", "POST"])
+@bp.route("/adicionar-questao/<int:simulado_id>", methods=["GET", "POST"])
 def adicionar_questao(simulado_id):
     if session.get("tipo") != "admin":
         return redirect("/login")
@@ -520,23 +637,12 @@ def adicionar_questao(simulado_id):
     cur = conn.cursor()
 
     if request.method == "POST":
-        cur.execute("""
         run_query(
             cur,
             """
             INSERT INTO questoes
             (simulado_id,enunciado,alt_a,alt_b,alt_c,alt_d,alt_e,correta)
             VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            simulado_id,
-            request.form.get("enunciado"),
-            request.form.get("a"),
-            request.form.get("b"),
-            request.form.get("c"),
-            request.form.get("d"),
-            request.form.get("e"),
-            request.form.get("correta")
-        ))
             """,
             (
                 simulado_id,
@@ -554,15 +660,13 @@ def adicionar_questao(simulado_id):
     cur.close()
     conn.close()
 
-    return render_template("adicionar_questao.html",
-                           simulado_id=simulado_id)
     return render_template("adicionar_questao.html", simulado_id=simulado_id)
 
 
 # =========================
 # ALUNO DASHBOARD
 # =========================
-@app.route("/aluno")
+@bp.route("/aluno")
 def aluno():
     if session.get("tipo") != "aluno":
         return redirect("/login")
@@ -572,8 +676,6 @@ def aluno():
     conn = get_db()
     cur = conn.cursor()
 
-    cur.execute("SELECT turma_id FROM usuarios WHERE id=%s", (usuario_id,))
-    turma = cur.fetchone()
     run_query(cur, "SELECT turma_id FROM usuarios WHERE id=%s", (usuario_id,))
     turma = fetch_one(cur)
 
@@ -581,24 +683,17 @@ def aluno():
     historico = []
     materiais = []
 
-    if turma:
     if turma and turma[0]:
         turma_id = turma[0]
 
-        cur.execute("""
         run_query(
             cur,
             """
             SELECT id, titulo FROM simulados
-            WHERE turma_id=%s AND ativo=TRUE
-        """, (turma_id,))
-        simulados = cur.fetchall()
-
-        cur.execute("""
-            WHERE turma_id=%s AND ativo=1
+            WHERE turma_id=%s AND ativo=%s
             ORDER BY id DESC
             """,
-            (turma_id,),
+            (turma_id, True),
         )
         simulados = fetch_all(cur)
 
@@ -609,8 +704,6 @@ def aluno():
             FROM resultados
             WHERE aluno_id=%s
             ORDER BY data_realizacao DESC
-        """, (usuario_id,))
-        historico = cur.fetchall()
             """,
             (usuario_id,),
         )
@@ -631,16 +724,13 @@ def aluno():
     cur.close()
     conn.close()
 
-    return render_template("aluno_dashboard.html",
-                           simulados=simulados,
-                           historico=historico)
     return render_template("aluno_dashboard.html", simulados=simulados, historico=historico, materiais=materiais)
 
 
 # =========================
 # FAZER SIMULADO
 # =========================
-@app.route("/fazer-simulado/<int:simulado_id>", methods=["GET", "POST"])
+@bp.route("/fazer-simulado/<int:simulado_id>", methods=["GET", "POST"])
 def fazer_simulado(simulado_id):
     if session.get("tipo") != "aluno":
         return redirect("/login")
@@ -651,9 +741,6 @@ def fazer_simulado(simulado_id):
     cur = conn.cursor()
 
     if request.method == "POST":
-        cur.execute("SELECT id, correta FROM questoes WHERE simulado_id=%s",
-                    (simulado_id,))
-        questoes = cur.fetchall()
         run_query(cur, "SELECT id, correta FROM questoes WHERE simulado_id=%s", (simulado_id,))
         questoes = fetch_all(cur)
 
@@ -667,15 +754,12 @@ def fazer_simulado(simulado_id):
 
         percentual = round((acertos / total) * 100, 2) if total else 0
 
-        cur.execute("""
         run_query(
             cur,
             """
             INSERT INTO resultados
             (aluno_id, simulado_id, acertos, total, percentual, data_realizacao)
             VALUES (%s,%s,%s,%s,%s,%s)
-        """, (usuario_id, simulado_id, acertos, total,
-              percentual, datetime.now().date()))
             """,
             (usuario_id, simulado_id, acertos, total, percentual, datetime.now().date()),
         )
@@ -684,20 +768,13 @@ def fazer_simulado(simulado_id):
         cur.close()
         conn.close()
 
-        return render_template("resultado.html",
-                               acertos=acertos,
-                               total=total,
-                               percentual=percentual)
         return render_template("resultado.html", acertos=acertos, total=total, percentual=percentual)
 
-    cur.execute("""
     run_query(
         cur,
         """
         SELECT id,enunciado,alt_a,alt_b,alt_c,alt_d,alt_e
         FROM questoes WHERE simulado_id=%s
-    """, (simulado_id,))
-    questoes = cur.fetchall()
         """,
         (simulado_id,),
     )
@@ -706,10 +783,330 @@ def fazer_simulado(simulado_id):
     cur.close()
     conn.close()
 
-    return render_template("fazer_simulado.html",
-                           questoes=questoes)
     return render_template("fazer_simulado.html", questoes=questoes)
 
 
+# =========================
+# PACOTE OFFLINE
+# =========================
+def pacote_signer():
+    return Signer(current_app.secret_key, salt="pacote-simulado")
+
+
+def carregar_pacote(cur, simulado_id):
+    # Questões só são adicionadas, então (quantidade, maior id) identifica a
+    # versão atual e permite reaproveitar o pacote montado por este processo.
+    run_query(cur, "SELECT COUNT(*), MAX(id) FROM questoes WHERE simulado_id=%s", (simulado_id,))
+    carimbo = tuple(fetch_one(cur))
+
+    pacotes = current_app.extensions["pacotes"]
+    pacote = pacotes.get(simulado_id)
+    if pacote and pacote["carimbo"] == carimbo:
+        return pacote
+
+    run_query(cur, "SELECT titulo FROM simulados WHERE id=%s", (simulado_id,))
+    simulado = fetch_one(cur)
+    if not simulado:
+        return None
+
+    run_query(
+        cur,
+        """
+        SELECT id,enunciado,alt_a,alt_b,alt_c,alt_d,alt_e,correta
+        FROM questoes WHERE simulado_id=%s
+        ORDER BY id
+        """,
+        (simulado_id,),
+    )
+    questoes = fetch_all(cur)
+
+    conteudo = {
+        "simulado_id": simulado_id,
+        "titulo": simulado[0],
+        "questoes": [list(q[:7]) for q in questoes],
+    }
+    versao = hashlib.sha256(json.dumps(conteudo, separators=(",", ":")).encode()).hexdigest()[:16]
+    conteudo["versao"] = versao
+    conteudo["assinatura"] = pacote_signer().sign(f"{simulado_id}:{versao}").decode()
+
+    pacote = {
+        "carimbo": carimbo,
+        "versao": versao,
+        "corpo": json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode(),
+        "gabarito": {q[0]: q[7] for q in questoes},
+    }
+    pacotes[simulado_id] = pacote
+    return pacote
+
+
+def aluno_tem_acesso(cur, simulado_id, usuario_id):
+    run_query(
+        cur,
+        """
+        SELECT 1
+        FROM simulados s
+        JOIN usuarios u ON u.turma_id = s.turma_id
+        WHERE s.id=%s AND u.id=%s
+        """,
+        (simulado_id, usuario_id),
+    )
+    return fetch_one(cur) is not None
+
+
+@bp.route("/pacote-simulado/<int:simulado_id>")
+def pacote_simulado(simulado_id):
+    if session.get("tipo") not in {"admin", "aluno"}:
+        return redirect("/login")
+
+    conn = get_db()
+    cur = conn.cursor()
+    if session["tipo"] == "aluno" and not aluno_tem_acesso(cur, simulado_id, session["user_id"]):
+        pacote = None
+    else:
+        pacote = carregar_pacote(cur, simulado_id)
+    cur.close()
+    conn.close()
+
+    if not pacote:
+        return jsonify(erro="Simulado não encontrado."), 404
+
+    resposta = current_app.response_class(pacote["corpo"], mimetype="application/json")
+    resposta.set_etag(pacote["versao"])
+    # Sempre revalida (304 barato via ETag) para não servir um pacote antigo
+    # depois de novas questões; a cópia offline fica no localStorage da página.
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
+
+@bp.route("/simulado-offline/<int:simulado_id>")
+def simulado_offline(simulado_id):
+    if session.get("tipo") != "aluno":
+        return redirect("/login")
+
+    conn = get_db()
+    cur = conn.cursor()
+    acesso = aluno_tem_acesso(cur, simulado_id, session["user_id"])
+    cur.close()
+    conn.close()
+
+    if not acesso:
+        return redirect("/aluno")
+
+    # A página não traz as questões: ela lê o pacote (cacheado pelo navegador)
+    # e guarda as respostas localmente até haver conexão para enviá-las.
+    resposta = current_app.make_response(render_template("simulado_offline.html", simulado_id=simulado_id, usuario_id=session["user_id"]))
+    resposta.cache_control.private = True
+    resposta.cache_control.max_age = 86400
+    return resposta
+
+
+@bp.route("/importar-respostas/<int:simulado_id>", methods=["POST"])
+def importar_respostas(simulado_id):
+    if session.get("tipo") != "admin":
+        return redirect("/login")
+
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify(erro="Envie um objeto JSON com assinatura e folhas."), 400
+
+    folhas = dados.get("folhas")
+    if not isinstance(folhas, list) or not folhas:
+        return jsonify(erro="Envie ao menos uma folha de respostas."), 400
+
+    try:
+        assinado = pacote_signer().unsign(str(dados.get("assinatura", ""))).decode()
+    except BadSignature:
+        return jsonify(erro="Assinatura do pacote inválida."), 400
+
+    pacote_id, _, versao = assinado.partition(":")
+    if pacote_id != str(simulado_id):
+        return jsonify(erro="O pacote não pertence a este simulado."), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    try:
+        pacote = carregar_pacote(cur, simulado_id)
+        if not pacote:
+            return jsonify(erro="Simulado não encontrado."), 404
+        if pacote["versao"] != versao:
+            return jsonify(erro="O simulado mudou desde a exportação do pacote."), 409
+
+        run_query(
+            cur,
+            """
+            SELECT u.id
+            FROM usuarios u
+            JOIN simulados s ON s.turma_id = u.turma_id
+            WHERE s.id=%s AND u.tipo='aluno'
+            """,
+            (simulado_id,),
+        )
+        alunos = {r[0] for r in fetch_all(cur)}
+
+        gabarito = pacote["gabarito"]
+        total = len(gabarito)
+        hoje = datetime.now().date()
+        linhas = []
+        vistos = set()
+
+        for numero, folha in enumerate(folhas, 1):
+            aluno_id = folha.get("aluno_id") if isinstance(folha, dict) else None
+            if not isinstance(aluno_id, int) or isinstance(aluno_id, bool) or aluno_id not in alunos:
+                return jsonify(erro=f"Folha {numero}: aluno inválido para este simulado."), 400
+            if aluno_id in vistos:
+                return jsonify(erro=f"Folha {numero}: aluno repetido no lote."), 400
+            vistos.add(aluno_id)
+
+            respostas = folha.get("respostas") or {}
+            if not isinstance(respostas, dict):
+                return jsonify(erro=f"Folha {numero}: respostas inválidas."), 400
+
+            try:
+                data_realizacao = date.fromisoformat(folha["data"]) if folha.get("data") else hoje
+            except (TypeError, ValueError):
+                return jsonify(erro=f"Folha {numero}: data inválida."), 400
+
+            # Aceita as chaves do formulário ("q12") e o id puro ("12").
+            marcadas = {}
+            for chave, valor in respostas.items():
+                questao_id = chave[1:] if chave.startswith("q") else chave
+                if not questao_id.isdigit() or int(questao_id) not in gabarito:
+                    return jsonify(erro=f"Folha {numero}: questão desconhecida '{chave}'."), 400
+                marcadas[int(questao_id)] = valor
+
+            acertos = sum(1 for questao_id, correta in gabarito.items() if marcadas.get(questao_id) == correta)
+            percentual = round((acertos / total) * 100, 2) if total else 0
+            linhas.append((aluno_id, simulado_id, acertos, total, percentual, data_realizacao))
+
+        run_many(
+            cur,
+            """
+            INSERT INTO resultados
+            (aluno_id, simulado_id, acertos, total, percentual, data_realizacao)
+            VALUES (%s,%s,%s,%s,%s,%s)
+            """,
+            linhas,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    return jsonify(importadas=len(linhas), versao=versao)
+
+
+# =========================
+# FÁBRICA DA APLICAÇÃO
+# =========================
+def aquecer(app):
+    """Prepara pool, pacotes/gabaritos e versões dos estáticos antes do tráfego.
+
+    Com INIT_DB, falhas ao criar o esquema interrompem a inicialização. Já o
+    aquecimento do pool e dos caches é opcional: se o banco estiver fora do ar
+    só gera aviso e as requisições tentam conectar normalmente depois.
+    """
+    with app.app_context():
+        for raiz, _, arquivos in os.walk(app.static_folder):
+            for nome in arquivos:
+                versao_asset(os.path.relpath(os.path.join(raiz, nome), app.static_folder).replace(os.sep, "/"))
+
+        if app.config["INIT_DB"]:
+            criar_tabelas()
+            criar_admin()
+
+        try:
+            conn = get_db()
+            cur = conn.cursor()
+            run_query(cur, "SELECT id FROM simulados WHERE ativo=%s", (True,))
+            for (simulado_id,) in fetch_all(cur):
+                carregar_pacote(cur, simulado_id)
+            cur.close()
+        except Exception as erro:
+            app.logger.warning("Pré-aquecimento do banco ignorado: %s", erro)
+
+
+def encerrar_pool(app):
+    """Fecha o pool do processo atual; usado no pre_fork do gunicorn --preload."""
+    app.extensions["banco"].fechar()
+
+
+def aquecer_worker(app):
+    """Abre o pool do worker recém-criado; usado no post_fork do gunicorn --preload."""
+    banco_app = app.extensions["banco"]
+    if banco_app.usa_sqlite:
+        return
+    try:
+        banco_app.pool()
+    except Exception as erro:
+        app.logger.warning("Pré-aquecimento do pool ignorado: %s", erro)
+
+
+def carregar_brotli():
+    try:
+        return importlib.import_module("brotli")
+    except ImportError:
+        return None
+
+
+def create_app(config=None):
+    inicio = time.perf_counter()
+
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=os.getenv("SECRET_KEY", "chave_super_secreta_123"),
+        DATABASE_URL=os.getenv("DATABASE_URL"),
+        DB_POOL_MIN=int(os.getenv("DB_POOL_MIN", "1")),
+        DB_POOL_MAX=int(os.getenv("DB_POOL_MAX", "10")),
+        DB_POOL_TIMEOUT=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        COMPRESS_MIN_SIZE=int(os.getenv("COMPRESS_MIN_SIZE", "500")),
+        COMPRESS_MAX_SIZE=int(os.getenv("COMPRESS_MAX_SIZE", str(1024 * 1024))),
+        INIT_DB=os.getenv("INIT_DB") == "1",
+        PRELOAD=os.getenv("PRELOAD", "1") == "1",
+        STARTUP_BUDGET=float(os.getenv("STARTUP_BUDGET", "2.0")),
+    )
+    if config:
+        app.config.update(config)
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    app.extensions["banco"] = Banco(
+        app.config["DATABASE_URL"],
+        app.config["DB_POOL_MIN"],
+        app.config["DB_POOL_MAX"],
+        app.config["DB_POOL_TIMEOUT"],
+    )
+    app.extensions["pacotes"] = {}
+    app.extensions["assets"] = {}
+    app.extensions["comprimidos"] = {}
+    app.extensions["brotli"] = carregar_brotli()
+    app.teardown_appcontext(liberar_conexoes)
+    app.register_blueprint(bp)
+
+    if app.config["PRELOAD"]:
+        aquecer(app)
+
+    duracao = time.perf_counter() - inicio
+    app.config["STARTUP_SECONDS"] = duracao
+    if duracao > app.config["STARTUP_BUDGET"]:
+        app.logger.warning("Inicialização levou %.3fs, acima do orçamento de %.3fs.", duracao, app.config["STARTUP_BUDGET"])
+    else:
+        app.logger.info("Inicialização levou %.3fs.", duracao)
+
+    return app
+
+
+def __getattr__(nome):
+    # Mantém "gunicorn app:app" funcionando: a aplicação só é criada quando
+    # alguém pede por ela, não no import do módulo.
+    if nome == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=True)
+    create_app().run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=True)
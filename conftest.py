@@ -0,0 +1,19 @@
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app({
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'teste.db'}",
+        "INIT_DB": True,
+        "TESTING": True,
+    })
+
+
+@pytest.fixture
+def admin(app):
+    cliente = app.test_client()
+    cliente.post("/login", data={"login": "admin", "senha": "123456"})
+    return cliente
@@ -0,0 +1,13 @@
+# Hooks para "gunicorn --preload app:app": o master cria a aplicação e aquece
+# os caches uma única vez; cada worker abre o seu próprio pool antes de atender.
+import app as aplicacao
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        aplicacao.encerrar_pool(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        aplicacao.aquecer_worker(worker.app.wsgi())
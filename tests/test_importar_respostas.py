@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from app import pacote_signer
+
+
+@pytest.fixture
+def simulado(app, admin):
+    """Turmas 1 e 2, alunos 2 (turma 1) e 3 (turma 2), simulado 1 da turma 1 com gabarito A, B."""
+    admin.post("/turmas", data={"nome": "Turma 1"})
+    admin.post("/turmas", data={"nome": "Turma 2"})
+    admin.post("/matricular", data={"nome": "Ana", "login": "ana", "senha": "x", "turma": "1"})
+    admin.post("/matricular", data={"nome": "Bia", "login": "bia", "senha": "x", "turma": "2"})
+    admin.post("/simulados-admin", data={"titulo": "Simulado 1", "turma": "1"})
+    for correta in ("A", "B"):
+        adicionar_questao(admin, 1, correta)
+    return admin.get("/pacote-simulado/1").get_json()
+
+
+def adicionar_questao(cliente, simulado_id, correta):
+    cliente.post(
+        f"/adicionar-questao/{simulado_id}",
+        data={"enunciado": "Questão", "a": "1", "b": "2", "c": "3", "d": "4", "e": "5", "correta": correta},
+    )
+
+
+def resultados(app):
+    caminho = app.extensions["banco"].sqlite_path
+    with sqlite3.connect(caminho) as conn:
+        return conn.execute("SELECT aluno_id, acertos, total, percentual FROM resultados").fetchall()
+
+
+def test_importa_e_corrige_folhas(app, admin, simulado):
+    resposta = admin.post(
+        "/importar-respostas/1",
+        json={
+            "assinatura": simulado["assinatura"],
+            "folhas": [{"aluno_id": 2, "respostas": {"q1": "A", "q2": "C"}}],
+        },
+    )
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()["importadas"] == 1
+    assert resultados(app) == [(2, 1, 2, 50.0)]
+
+
+def test_rejeita_assinatura_invalida(app, admin, simulado):
+    resposta = admin.post(
+        "/importar-respostas/1",
+        json={"assinatura": simulado["assinatura"] + "x", "folhas": [{"aluno_id": 2}]},
+    )
+
+    assert resposta.status_code == 400
+    assert resultados(app) == []
+
+
+def test_rejeita_pacote_de_outro_simulado(app, admin, simulado):
+    with app.app_context():
+        assinatura = pacote_signer().sign(f"2:{simulado['versao']}").decode()
+
+    resposta = admin.post("/importar-respostas/1", json={"assinatura": assinatura, "folhas": [{"aluno_id": 2}]})
+
+    assert resposta.status_code == 400
+    assert resultados(app) == []
+
+
+def test_rejeita_pacote_desatualizado(app, admin, simulado):
+    adicionar_questao(admin, 1, "C")
+
+    resposta = admin.post(
+        "/importar-respostas/1",
+        json={"assinatura": simulado["assinatura"], "folhas": [{"aluno_id": 2}]},
+    )
+
+    assert resposta.status_code == 409
+    assert resultados(app) == []
+
+
+def test_rejeita_aluno_de_outra_turma(app, admin, simulado):
+    resposta = admin.post(
+        "/importar-respostas/1",
+        json={
+            "assinatura": simulado["assinatura"],
+            "folhas": [{"aluno_id": 2, "respostas": {}}, {"aluno_id": 3, "respostas": {}}],
+        },
+    )
+
+    assert resposta.status_code == 400
+    assert "Folha 2" in resposta.get_json()["erro"]
+    assert resultados(app) == []